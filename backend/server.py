@@ -5,26 +5,234 @@ Bridges React frontend to Cline-API service
 
 import os
 import asyncio
-import json
+import atexit
+import importlib
+import logging
+import platform
+import queue
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple, Type, TypeVar, Union
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import httpx
+import msgspec
+import orjson
 import uvicorn
-from pydantic import BaseModel
+
+log = logging.getLogger("cline.backend")
+
+def start_log_listener():
+    """Route log records through a queue so stream writes happen off the event loop"""
+    root = logging.getLogger()
+    # server.py can be imported twice in one process (as __main__ and as "server:app")
+    if any(isinstance(handler, QueueHandler) for handler in root.handlers):
+        return
+    
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    
+    root.addHandler(QueueHandler(log_queue))
+    # Root keeps its default WARNING so libraries like httpx don't log every request
+    for name in ("cline.backend", "uvicorn"):
+        logging.getLogger(name).setLevel(logging.INFO)
+    
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+# Installed at import so uvicorn's own startup records and, with several workers,
+# the supervisor and every spawned worker log through the queue too
+start_log_listener()
 
 # Configuration
 CLINE_API_URL = os.getenv('CLINE_API_URL', 'http://localhost:3002')
 ENHANCED_CLINE_API_URL = os.getenv('ENHANCED_CLINE_API_URL', 'http://localhost:3003')
+# Unix socket of a colocated Cline API; skips the loopback TCP stack when set
+CLINE_API_UDS = os.getenv('CLINE_API_UDS')
+# Bind to loopback; TLS and public exposure are handled by a reverse proxy (see README.md)
+BACKEND_HOST = os.getenv('BACKEND_HOST', '127.0.0.1')
+# Listen on a Unix socket instead of BACKEND_HOST:8001 when the proxy is colocated
+BACKEND_UDS = os.getenv('BACKEND_UDS')
+# Sessions and their WebSocket subscribers live in process memory, so this must stay 1:
+# uvicorn workers share one listening socket and a client's requests can land on any of them
+BACKEND_WORKERS = int(os.getenv('BACKEND_WORKERS', '1'))
+if BACKEND_WORKERS != 1:
+    log.warning("BACKEND_WORKERS=%d splits in-memory sessions across processes; use 1", BACKEND_WORKERS)
+# Optional io_uring event loop policy as "module:PolicyClass"; uvloop is used otherwise
+IO_URING_LOOP_POLICY = os.getenv('IO_URING_LOOP_POLICY')
+IO_URING_MIN_KERNEL = (5, 11)
+
+def kernel_supports_io_uring() -> bool:
+    """Check for a Linux kernel new enough for io_uring socket operations"""
+    if platform.system() != "Linux":
+        return False
+    try:
+        version = tuple(int(part) for part in platform.release().split("-")[0].split(".")[:2])
+    except ValueError:
+        return False
+    return version >= IO_URING_MIN_KERNEL
+
+def select_event_loop() -> str:
+    """Install the io_uring loop policy if configured and supported, return uvicorn's loop setting"""
+    if not IO_URING_LOOP_POLICY:
+        return "uvloop"
+    if not kernel_supports_io_uring():
+        log.warning("Kernel %s lacks io_uring support, using uvloop", platform.release())
+        return "uvloop"
+    try:
+        module_name, _, policy_name = IO_URING_LOOP_POLICY.partition(":")
+        policy_class = getattr(importlib.import_module(module_name), policy_name)
+    except (ImportError, AttributeError, ValueError) as e:
+        log.warning("io_uring loop policy unavailable (%s), using uvloop", e)
+        return "uvloop"
+    asyncio.set_event_loop_policy(policy_class())
+    # uvicorn must not replace the policy installed above
+    return "none"
+
+# Selected at import so spawned uvicorn workers install the same policy
+EVENT_LOOP = select_event_loop()
+
+# Naive utcnow() datetimes are emitted as ISO 8601 with a trailing "Z"
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes with orjson"""
+    return orjson.dumps(obj, option=ORJSON_OPTIONS)
+
+class ChatJSONResponse(ORJSONResponse):
+    """orjson-backed response; handlers return it directly so FastAPI's
+    jsonable_encoder pass is skipped and datetimes get the same format everywhere"""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# WebSocket codecs; clients pick one with "codec" on join_session (default: JSON text frames)
+CODEC_JSON = "json"
+CODEC_JSON_BINARY = "json-binary"
+CODEC_MSGPACK = "msgpack"
+WS_CODECS = {CODEC_JSON, CODEC_JSON_BINARY, CODEC_MSGPACK}
+
+# Outbound WebSocket message shapes; "type" is written from each struct's tag
+class WSMessage(msgspec.Struct, tag_field="type", omit_defaults=True):
+    pass
+
+class SessionJoined(WSMessage, tag="session_joined"):
+    sessionId: str
+    connectionId: str
+    timestamp: int
+
+class UserMessage(WSMessage, tag="user_message"):
+    content: Optional[str]
+    mode: str
+    timestamp: int
+
+class AgentResponse(WSMessage, tag="agent_response"):
+    content: Optional[str]
+    mode: str
+    timestamp: int
+    toolUsed: Optional[str] = None
+    executionResult: Any = None
+
+class ModeSwitched(WSMessage, tag="mode_switched"):
+    mode: str
+    sessionId: Optional[str] = None
+    message: Optional[str] = None
+    timestamp: Optional[int] = None
+
+class MessageError(WSMessage, tag="message_error"):
+    error: str
+    sessionId: str
+    timestamp: int
+
+# Encoders are built once and reused for every frame
+_json_encoder = msgspec.json.Encoder()
+_msgpack_encoder = msgspec.msgpack.Encoder()
+
+def decode_ws_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a raw ASGI WebSocket message from a text or binary frame"""
+    data = message.get("bytes")
+    if data is None:
+        return orjson.loads(message["text"])
+    # Binary frames holding a JSON object start with "{" (msgpack maps never do);
+    # orjson parses the bytes without a separate UTF-8 decode
+    if data.lstrip()[:1] == b"{":
+        return orjson.loads(data)
+    return msgspec.msgpack.decode(data)
+
+def encode_ws_message(message: WSMessage, codec: str) -> Union[str, bytes]:
+    """Encode a message as a text (JSON) or binary (JSON/msgpack) frame payload"""
+    if codec == CODEC_MSGPACK:
+        return _msgpack_encoder.encode(message)
+    if codec == CODEC_JSON_BINARY:
+        return _json_encoder.encode(message)
+    return _json_encoder.encode(message).decode()
+
+# Frames buffered per connection before a slow consumer is disconnected
+WS_SEND_QUEUE_SIZE = 32
+# Incoming frames the websockets library buffers before it stops reading the socket
+WS_RECEIVE_QUEUE_SIZE = 32
+WS_MAX_MESSAGE_SIZE = 1024 * 1024
+
+async def ws_sender(websocket: WebSocket, outgoing: asyncio.Queue):
+    """Drain a connection's outgoing queue onto the socket"""
+    try:
+        while True:
+            payload = await outgoing.get()
+            if isinstance(payload, bytes):
+                await websocket.send_bytes(payload)
+            else:
+                await websocket.send_text(payload)
+    except Exception as e:
+        log.warning("WebSocket send failed: %s", e)
+        # Remove dead connection
+        disconnect_websocket(websocket)
+
+# Close handshakes in progress; referenced so the tasks aren't garbage collected
+_closing_tasks: Set[asyncio.Task] = set()
+
+async def close_websocket(websocket: WebSocket, code: int):
+    """Close a WebSocket, ignoring peers that are already gone"""
+    try:
+        await websocket.close(code=code)
+    except Exception:
+        pass
+
+def close_slow_consumer(websocket: WebSocket):
+    """Disconnect a client that stopped reading and let it reconnect later"""
+    log.warning("Closing WebSocket for session %s: send queue full",
+                getattr(websocket.state, "session_id", None))
+    websocket.state.closing = True
+    disconnect_websocket(websocket)
+    websocket.state.sender.cancel()
+    # The close handshake can stall on a stuck reader, so it must not block the caller
+    task = asyncio.create_task(close_websocket(websocket, 1013))
+    _closing_tasks.add(task)
+    task.add_done_callback(_closing_tasks.discard)
+
+def send_ws_payload(websocket: WebSocket, payload: Union[str, bytes]):
+    """Queue an already encoded frame payload for the connection's sender task"""
+    if getattr(websocket.state, "closing", False):
+        return
+    try:
+        websocket.state.outgoing.put_nowait(payload)
+    except asyncio.QueueFull:
+        close_slow_consumer(websocket)
+
+async def send_ws_message(websocket: WebSocket, message: WSMessage):
+    """Send a message using the codec negotiated for this connection"""
+    codec = getattr(websocket.state, "codec", CODEC_JSON)
+    send_ws_payload(websocket, encode_ws_message(message, codec))
 
 app = FastAPI(
     title="Cline Chat Backend",
     description="Backend service bridging React frontend to Cline-API functionality",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ChatJSONResponse
 )
 
 # CORS middleware
@@ -38,269 +246,363 @@ app.add_middleware(
 
 # In-memory storage for sessions and WebSocket connections
 active_sessions: Dict[str, Dict] = {}
-websocket_connections: Dict[str, WebSocket] = {}
+websocket_connections: Dict[str, Set[WebSocket]] = {}
+
+# Serialized response caches: health is refreshed at most once per second,
+# the session list is rebuilt only after active_sessions changes
+HEALTH_CACHE_TTL = 1.0
+_health_cache: Tuple[float, bytes] = (0.0, b"")
+_sessions_cache: Optional[bytes] = None
+
+# Wall-clock milliseconds for message timestamps, refreshed by tick_clock()
+CLOCK_RESOLUTION = 0.005
+_now_ms: int = time.time_ns() // 1_000_000
+
+async def tick_clock():
+    """Keep _now_ms current so messages don't each build a datetime"""
+    global _now_ms
+    while True:
+        _now_ms = time.time_ns() // 1_000_000
+        await asyncio.sleep(CLOCK_RESOLUTION)
+
+def invalidate_sessions_cache():
+    """Mark the cached session list as stale"""
+    global _sessions_cache
+    _sessions_cache = None
+
+# Last enhanced session status fetch per enhanced session id; polling within the TTL reuses it
+ENHANCED_STATUS_TTL = 0.5
+_enhanced_status_fetched: Dict[str, float] = {}
+
+def invalidate_enhanced_status(enhanced_session_id: str):
+    """Force the next get_chat_session to refresh from the enhanced API"""
+    _enhanced_status_fetched.pop(enhanced_session_id, None)
+
+# Upstream GETs currently in flight, keyed by URL
+_inflight_gets: Dict[str, asyncio.Task] = {}
+
+async def coalesced_get(url: str, timeout: float) -> httpx.Response:
+    """GET an upstream URL, sharing a single request among concurrent callers"""
+    task = _inflight_gets.get(url)
+    if task is None:
+        task = asyncio.create_task(app.state.http.get(url, timeout=timeout))
+        _inflight_gets[url] = task
+        task.add_done_callback(lambda _: _inflight_gets.pop(url, None))
+    # Shield so one caller going away does not cancel the request for the others
+    return await asyncio.shield(task)
 
 # Request/Response models
-class ChatSessionRequest(BaseModel):
+class ChatSessionRequest(msgspec.Struct):
     mode: str = "ACT"
     qualityLevel: str = "advanced"
     description: Optional[str] = None
 
-class ChatMessageRequest(BaseModel):
+class ChatMessageRequest(msgspec.Struct):
     message: str
     mode: str = "ACT"
 
-class ModeRequest(BaseModel):
+class ModeRequest(msgspec.Struct):
     mode: str
 
+RequestBody = TypeVar("RequestBody", bound=msgspec.Struct)
+
+def json_body(model: Type[RequestBody]) -> Callable:
+    """Dependency that decodes and validates the JSON request body with msgspec"""
+    decoder = msgspec.json.Decoder(model)
+    
+    async def decode(request: Request) -> RequestBody:
+        try:
+            return decoder.decode(await request.body())
+        except msgspec.DecodeError as e:
+            raise HTTPException(status_code=422, detail=validation_errors(e))
+    
+    return decode
+
+MISSING_FIELD_PREFIX = "Object missing required field `"
+
+def validation_errors(error: msgspec.DecodeError) -> List[Dict[str, Any]]:
+    """Shape a msgspec error like FastAPI's request validation errors"""
+    if not isinstance(error, msgspec.ValidationError):
+        return [{"type": "json_invalid", "loc": ["body"], "msg": str(error)}]
+    # msgspec reports the offending field as a "- at `$.field`" suffix
+    msg, _, path = str(error).partition(" - at `$")
+    loc = ["body"] + [part for part in path.rstrip("`").split(".") if part]
+    if msg.startswith(MISSING_FIELD_PREFIX):
+        return [{"type": "missing", "loc": loc + [msg[len(MISSING_FIELD_PREFIX):].rstrip("`")], "msg": msg}]
+    return [{"type": "value_error", "loc": loc, "msg": msg}]
+
+def json_body_openapi(model: Type[msgspec.Struct]) -> Dict[str, Any]:
+    """OpenAPI requestBody for a route whose body is decoded by json_body()"""
+    (_,), components = msgspec.json.schema_components([model])
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": components[model.__name__]}}
+        }
+    }
+
 # Health check
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {
-        "status": "ok",
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": "1.0.0",
-        "services": {
-            "cline_api": "connected",
-            "enhanced_cline_api": "connected"
-        }
-    }
+    global _health_cache
+    now = time.monotonic()
+    if not _health_cache[1] or now - _health_cache[0] >= HEALTH_CACHE_TTL:
+        _health_cache = (now, dumps({
+            "status": "ok",
+            "timestamp": datetime.utcnow(),
+            "version": "1.0.0",
+            "services": {
+                "cline_api": "connected",
+                "enhanced_cline_api": "connected"
+            }
+        }))
+    return Response(content=_health_cache[1], media_type="application/json")
 
 # Chat session management
-@app.post("/api/chat/sessions")
-async def create_chat_session(request: ChatSessionRequest):
+@app.post("/api/chat/sessions", openapi_extra=json_body_openapi(ChatSessionRequest))
+async def create_chat_session(request: ChatSessionRequest = Depends(json_body(ChatSessionRequest))):
     """Create a new chat session"""
     try:
         session_id = str(uuid.uuid4())
         
         # Try to create session with Enhanced Cline API first
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{ENHANCED_CLINE_API_URL}/api/sessions",
-                    json={
-                        "startMode": request.mode,
-                        "qualityLevel": request.qualityLevel,
-                        "description": request.description
-                    },
-                    timeout=30.0
-                )
+        client = app.state.http
+        try:
+            response = await client.post(
+                f"{ENHANCED_CLINE_API_URL}/api/sessions",
+                json={
+                    "startMode": request.mode,
+                    "qualityLevel": request.qualityLevel,
+                    "description": request.description
+                },
+                timeout=30.0
+            )
+            
+            if response.status_code == 200:
+                enhanced_session = response.json()
                 
-                if response.status_code == 200:
-                    enhanced_session = response.json()
-                    
-                    # Store session info
-                    active_sessions[session_id] = {
-                        "id": session_id,
-                        "created": datetime.utcnow().isoformat(),
-                        "mode": request.mode,
-                        "qualityLevel": request.qualityLevel,
-                        "enhanced_session_id": enhanced_session.get("sessionId"),
-                        "api_type": "enhanced",
-                        "status": "active"
-                    }
-                    
-                    return {
-                        "success": True,
-                        "sessionId": session_id,
-                        "mode": request.mode,
-                        "qualityLevel": request.qualityLevel,
-                        "api_type": "enhanced",
-                        "enhanced_session_id": enhanced_session.get("sessionId")
-                    }
-                    
-            except Exception as e:
-                print(f"Enhanced API not available: {e}")
-                pass
+                # Store session info
+                active_sessions[session_id] = {
+                    "id": session_id,
+                    "created": datetime.utcnow(),
+                    "mode": request.mode,
+                    "qualityLevel": request.qualityLevel,
+                    "enhanced_session_id": enhanced_session.get("sessionId"),
+                    "api_type": "enhanced",
+                    "status": "active"
+                }
+                invalidate_sessions_cache()
+                
+                return ChatJSONResponse({
+                    "success": True,
+                    "sessionId": session_id,
+                    "mode": request.mode,
+                    "qualityLevel": request.qualityLevel,
+                    "api_type": "enhanced",
+                    "enhanced_session_id": enhanced_session.get("sessionId")
+                })
+                
+        except Exception as e:
+            log.warning("Enhanced API not available: %s", e)
+            pass
         
         # Fallback to basic session creation
         active_sessions[session_id] = {
             "id": session_id,
-            "created": datetime.utcnow().isoformat(),
+            "created": datetime.utcnow(),
             "mode": request.mode,
             "qualityLevel": request.qualityLevel,
             "api_type": "basic",
             "status": "active"
         }
+        invalidate_sessions_cache()
         
-        return {
+        return ChatJSONResponse({
             "success": True,
             "sessionId": session_id,
             "mode": request.mode,
             "qualityLevel": request.qualityLevel,
             "api_type": "basic"
-        }
+        })
         
     except Exception as e:
-        print(f"Session creation error: {e}")
+        log.exception("Session creation error")
         raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
 
 @app.get("/api/chat/sessions/{session_id}")
 async def get_chat_session(session_id: str):
     """Get chat session information"""
-    if session_id not in active_sessions:
+    session = active_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = active_sessions[session_id]
-    
-    # If enhanced session, get status from enhanced API
-    if session.get("api_type") == "enhanced" and session.get("enhanced_session_id"):
+    # If enhanced session, get status from enhanced API unless it was fetched recently
+    enhanced_session_id = session.get("enhanced_session_id")
+    if (
+        session.get("api_type") == "enhanced"
+        and enhanced_session_id
+        and time.monotonic() - _enhanced_status_fetched.get(enhanced_session_id, 0.0) >= ENHANCED_STATUS_TTL
+    ):
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{ENHANCED_CLINE_API_URL}/api/sessions/{session['enhanced_session_id']}",
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    enhanced_status = response.json()
-                    session.update(enhanced_status)
+            response = await coalesced_get(
+                f"{ENHANCED_CLINE_API_URL}/api/sessions/{enhanced_session_id}",
+                timeout=10.0
+            )
+            
+            if response.status_code == 200:
+                enhanced_status = response.json()
+                session.update(enhanced_status)
+                _enhanced_status_fetched[enhanced_session_id] = time.monotonic()
+                invalidate_sessions_cache()
                     
-        except Exception as e:
-            print(f"Failed to get enhanced session status: {e}")
+        except Exception:
+            log.exception("Failed to get enhanced session status")
     
-    return {
+    return ChatJSONResponse({
         "success": True,
         **session
-    }
+    })
 
 @app.get("/api/chat/sessions")
 async def list_chat_sessions():
     """List all active chat sessions"""
+    global _sessions_cache
+    if _sessions_cache is None:
+        _sessions_cache = dumps({
+            "success": True,
+            "sessions": list(active_sessions.values()),
+            "count": len(active_sessions)
+        })
+    return Response(content=_sessions_cache, media_type="application/json")
+
+async def dispatch_message(session: Dict[str, Any], message: str, mode: str) -> Dict[str, Any]:
+    """Send a user message to the session's agent and return its response"""
+    # If enhanced session, use enhanced API
+    if session.get("api_type") == "enhanced" and session.get("enhanced_session_id"):
+        response = await app.state.http.post(
+            f"{ENHANCED_CLINE_API_URL}/api/sessions/{session['enhanced_session_id']}/messages",
+            json={
+                "message": message,
+                "options": {
+                    "mode": mode
+                }
+            },
+            timeout=60.0
+        )
+        invalidate_enhanced_status(session["enhanced_session_id"])
+        
+        if response.status_code == 200:
+            return response.json()
+    
+    # Fallback to basic response
     return {
-        "success": True,
-        "sessions": list(active_sessions.values()),
-        "count": len(active_sessions)
+        "content": f"Received message: {message}",
+        "mode": mode
     }
 
-@app.post("/api/chat/sessions/{session_id}/messages")
-async def send_chat_message(session_id: str, request: ChatMessageRequest):
+def agent_response_message(result: Dict[str, Any], mode: str) -> AgentResponse:
+    """Build the WebSocket agent_response message for a dispatch result"""
+    return AgentResponse(
+        content=result.get("content", ""),
+        mode=mode,
+        timestamp=_now_ms,
+        toolUsed=result.get("toolUsed"),
+        executionResult=result.get("executionResult")
+    )
+
+@app.post(
+    "/api/chat/sessions/{session_id}/messages",
+    openapi_extra=json_body_openapi(ChatMessageRequest)
+)
+async def send_chat_message(
+    session_id: str,
+    request: ChatMessageRequest = Depends(json_body(ChatMessageRequest))
+):
     """Send message to chat session"""
-    if session_id not in active_sessions:
+    session = active_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = active_sessions[session_id]
-    
     try:
-        # If enhanced session, use enhanced API
-        if session.get("api_type") == "enhanced" and session.get("enhanced_session_id"):
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{ENHANCED_CLINE_API_URL}/api/sessions/{session['enhanced_session_id']}/messages",
-                    json={
-                        "message": request.message,
-                        "options": {
-                            "mode": request.mode
-                        }
-                    },
-                    timeout=60.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Broadcast to WebSocket if connected
-                    if session_id in websocket_connections:
-                        await broadcast_to_session(session_id, {
-                            "type": "agent_response",
-                            "content": result.get("content", ""),
-                            "mode": request.mode,
-                            "timestamp": datetime.utcnow().isoformat(),
-                            "toolUsed": result.get("toolUsed"),
-                            "executionResult": result.get("executionResult")
-                        })
-                    
-                    return {
-                        "success": True,
-                        "sessionId": session_id,
-                        "response": result
-                    }
+        result = await dispatch_message(session, request.message, request.mode)
         
-        # Fallback to basic response
-        basic_response = f"Received message: {request.message}"
+        # Broadcast to subscribed WebSockets
+        await broadcast_to_session(session_id, agent_response_message(result, request.mode))
         
-        # Broadcast to WebSocket if connected
-        if session_id in websocket_connections:
-            await broadcast_to_session(session_id, {
-                "type": "agent_response", 
-                "content": basic_response,
-                "mode": request.mode,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
-        return {
+        return ChatJSONResponse({
             "success": True,
             "sessionId": session_id,
-            "response": {
-                "content": basic_response,
-                "mode": request.mode
-            }
-        }
+            "response": result
+        })
         
     except Exception as e:
-        print(f"Message processing error: {e}")
+        log.exception("Message processing error")
         raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
 
-@app.post("/api/chat/sessions/{session_id}/mode")
-async def switch_session_mode(session_id: str, request: ModeRequest):
+@app.post(
+    "/api/chat/sessions/{session_id}/mode",
+    openapi_extra=json_body_openapi(ModeRequest)
+)
+async def switch_session_mode(
+    session_id: str,
+    request: ModeRequest = Depends(json_body(ModeRequest))
+):
     """Switch session mode (PLAN/ACT)"""
-    if session_id not in active_sessions:
+    session = active_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = active_sessions[session_id]
-    
     try:
         # If enhanced session, use enhanced API
         if session.get("api_type") == "enhanced" and session.get("enhanced_session_id"):
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{ENHANCED_CLINE_API_URL}/api/sessions/{session['enhanced_session_id']}/mode",
-                    json={"mode": request.mode},
-                    timeout=10.0
-                )
+            client = app.state.http
+            response = await client.post(
+                f"{ENHANCED_CLINE_API_URL}/api/sessions/{session['enhanced_session_id']}/mode",
+                json={"mode": request.mode},
+                timeout=10.0
+            )
+            invalidate_enhanced_status(session["enhanced_session_id"])
+            
+            if response.status_code == 200:
+                result = response.json()
+                session["mode"] = request.mode
+                invalidate_sessions_cache()
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    session["mode"] = request.mode
-                    
-                    # Broadcast mode change
-                    if session_id in websocket_connections:
-                        await broadcast_to_session(session_id, {
-                            "type": "mode_switched",
-                            "mode": request.mode,
-                            "message": result.get("message", f"Switched to {request.mode} mode")
-                        })
-                    
-                    return {
-                        "success": True,
-                        "sessionId": session_id,
-                        "previousMode": session.get("mode"),
-                        "currentMode": request.mode,
-                        "result": result
-                    }
+                # Broadcast mode change
+                await broadcast_to_session(session_id, ModeSwitched(
+                    mode=request.mode,
+                    message=result.get("message", f"Switched to {request.mode} mode")
+                ))
+                
+                return ChatJSONResponse({
+                    "success": True,
+                    "sessionId": session_id,
+                    "previousMode": session.get("mode"),
+                    "currentMode": request.mode,
+                    "result": result
+                })
         
         # Basic mode switch
         previous_mode = session.get("mode", "ACT")
         session["mode"] = request.mode
+        invalidate_sessions_cache()
         
         # Broadcast mode change
-        if session_id in websocket_connections:
-            await broadcast_to_session(session_id, {
-                "type": "mode_switched",
-                "mode": request.mode,
-                "message": f"Switched from {previous_mode} to {request.mode} mode"
-            })
+        await broadcast_to_session(session_id, ModeSwitched(
+            mode=request.mode,
+            message=f"Switched from {previous_mode} to {request.mode} mode"
+        ))
         
-        return {
+        return ChatJSONResponse({
             "success": True,
             "sessionId": session_id,
             "previousMode": previous_mode,
             "currentMode": request.mode
-        }
+        })
         
     except Exception as e:
-        print(f"Mode switch error: {e}")
+        log.exception("Mode switch error")
         raise HTTPException(status_code=500, detail=f"Failed to switch mode: {str(e)}")
 
 # WebSocket endpoint for real-time communication
@@ -310,103 +612,180 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     connection_id = str(uuid.uuid4())
     
+    # Outgoing frames go through a bounded queue so a slow reader can't pin memory
+    websocket.state.outgoing = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+    websocket.state.sender = asyncio.create_task(ws_sender(websocket, websocket.state.outgoing))
+    
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(data.get("code", 1000))
+            message_data = decode_ws_message(data)
             
             message_type = message_data.get("type")
             
             if message_type == "join_session":
                 session_id = message_data.get("sessionId")
                 if session_id and session_id in active_sessions:
-                    websocket_connections[session_id] = websocket
+                    codec = message_data.get("codec")
+                    websocket.state.codec = codec if codec in WS_CODECS else CODEC_JSON
+                    # A connection follows one session at a time
+                    disconnect_websocket(websocket)
+                    websocket_connections.setdefault(session_id, set()).add(websocket)
+                    websocket.state.session_id = session_id
                     
-                    await websocket.send_text(json.dumps({
-                        "type": "session_joined",
-                        "sessionId": session_id,
-                        "connectionId": connection_id,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }))
+                    await send_ws_message(websocket, SessionJoined(
+                        sessionId=session_id,
+                        connectionId=connection_id,
+                        timestamp=_now_ms
+                    ))
                     
             elif message_type == "chat_message":
-                session_id = message_data.get("sessionId")
+                # Default to the session this connection joined
+                session_id = message_data.get("sessionId") or getattr(websocket.state, "session_id", None)
                 content = message_data.get("content")
                 mode = message_data.get("mode", "ACT")
                 
-                if session_id and session_id in active_sessions:
+                session = active_sessions.get(session_id) if session_id else None
+                if session is not None:
+                    # Same contract as ChatMessageRequest on the HTTP path
+                    if not isinstance(content, str) or not isinstance(mode, str):
+                        await send_ws_message(websocket, MessageError(
+                            error="`content` and `mode` must be strings",
+                            sessionId=session_id,
+                            timestamp=_now_ms
+                        ))
+                        continue
+                    
                     # Echo user message
-                    await websocket.send_text(json.dumps({
-                        "type": "user_message",
-                        "content": content,
-                        "mode": mode,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }))
+                    await send_ws_message(websocket, UserMessage(
+                        content=content,
+                        mode=mode,
+                        timestamp=_now_ms
+                    ))
+                    
+                    # Process directly rather than round-tripping through the HTTP endpoint
+                    try:
+                        result = await dispatch_message(session, content, mode)
+                    except Exception as e:
+                        log.exception("Message processing error")
+                        await send_ws_message(websocket, MessageError(
+                            error=f"Failed to process message: {str(e)}",
+                            sessionId=session_id,
+                            timestamp=_now_ms
+                        ))
+                        continue
                     
-                    # Process via HTTP endpoint (this will handle the response)
-                    # You could also process directly here for better performance
+                    agent_response = agent_response_message(result, mode)
+                    await broadcast_to_session(session_id, agent_response)
+                    # Subscribers got it above; reply directly if this connection isn't one
+                    if getattr(websocket.state, "session_id", None) != session_id:
+                        await send_ws_message(websocket, agent_response)
                     
             elif message_type == "switch_mode":
                 session_id = message_data.get("sessionId") 
                 mode = message_data.get("mode")
                 
-                if session_id and session_id in active_sessions:
-                    active_sessions[session_id]["mode"] = mode
+                session = active_sessions.get(session_id) if session_id else None
+                if session is not None:
+                    session["mode"] = mode
+                    invalidate_sessions_cache()
                     
-                    await websocket.send_text(json.dumps({
-                        "type": "mode_switched",
-                        "mode": mode,
-                        "sessionId": session_id,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }))
+                    await send_ws_message(websocket, ModeSwitched(
+                        mode=mode,
+                        sessionId=session_id,
+                        timestamp=_now_ms
+                    ))
                     
     except WebSocketDisconnect:
         # Remove connection
-        for session_id, ws in list(websocket_connections.items()):
-            if ws == websocket:
-                del websocket_connections[session_id]
-                break
+        disconnect_websocket(websocket)
                 
-    except Exception as e:
-        print(f"WebSocket error: {e}")
+    except Exception:
+        log.exception("WebSocket error")
+        disconnect_websocket(websocket)
         await websocket.close()
+    
+    finally:
+        websocket.state.sender.cancel()
 
-async def broadcast_to_session(session_id: str, message: Dict[str, Any]):
-    """Broadcast message to specific session WebSocket"""
-    if session_id in websocket_connections:
-        try:
-            await websocket_connections[session_id].send_text(json.dumps(message))
-        except Exception as e:
-            print(f"Failed to broadcast to session {session_id}: {e}")
-            # Remove dead connection
-            if session_id in websocket_connections:
-                del websocket_connections[session_id]
-
-# Start Cline API services
-async def start_cline_services():
-    """Start the Cline API services in background"""
-    import subprocess
-    import os
+def disconnect_websocket(websocket: WebSocket):
+    """Remove a WebSocket from the subscribers of its session"""
+    session_id = getattr(websocket.state, "session_id", None)
+    subscribers = websocket_connections.get(session_id) if session_id else None
+    if subscribers is not None:
+        subscribers.discard(websocket)
+        if not subscribers:
+            del websocket_connections[session_id]
+
+async def broadcast_to_session(session_id: str, message: WSMessage):
+    """Broadcast message to every WebSocket subscribed to a session"""
+    subscribers = websocket_connections.get(session_id)
+    if not subscribers:
+        return
     
-    print("🔄 Cline API services will be started separately...")
-    print("📝 Frontend connects to this backend (port 8001)")
-    print("🤖 Cline APIs should run on ports 3002-3003 to avoid conflicts")
+    # Encode once per codec; queuing never waits on a slow subscriber
+    payloads: Dict[str, Union[str, bytes]] = {}
+    for websocket in list(subscribers):
+        codec = getattr(websocket.state, "codec", CODEC_JSON)
+        if codec not in payloads:
+            payloads[codec] = encode_ws_message(message, codec)
+        send_ws_payload(websocket, payloads[codec])
 
 @app.on_event("startup")
 async def startup_event():
     """Startup event to initialize services"""
-    print("🔄 Initializing Cline Chat Backend...")
-    print("🌐 Backend running on port 8001")
-    print("📱 Frontend should connect to http://localhost:8001")
-    print("🔌 WebSocket available at ws://localhost:8001/ws")
-    print("✅ Cline Chat Backend ready")
+    log.info("🔄 Initializing Cline Chat Backend...")
+    
+    app.state.clock_task = asyncio.create_task(tick_clock())
+    
+    # Shared upstream client so keep-alive connections to the Cline APIs are reused
+    limits = httpx.Limits(max_connections=200, max_keepalive_connections=100)
+    if CLINE_API_UDS:
+        app.state.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            # Plain HTTP over the socket is always HTTP/1.1, so http2 is not requested
+            transport=httpx.AsyncHTTPTransport(uds=CLINE_API_UDS, limits=limits)
+        )
+        log.info("🔗 Cline API requests routed over %s", CLINE_API_UDS)
+    else:
+        app.state.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            limits=limits,
+            # HTTP/2 is only negotiated via TLS ALPN, so this applies to https:// upstreams;
+            # http://localhost Cline APIs use the HTTP/1.1 keep-alive pool
+            http2=True
+        )
+    
+    log.info("🌐 Backend running on port 8001")
+    log.info("📱 Frontend should connect to http://localhost:8001")
+    log.info("🔌 WebSocket available at ws://localhost:8001/ws")
+    log.info("✅ Cline Chat Backend ready")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Shutdown event to release shared resources"""
+    app.state.clock_task.cancel()
+    await app.state.http.aclose()
 
 if __name__ == "__main__":
     uvicorn.run(
         "server:app",
-        host="0.0.0.0", 
+        host=BACKEND_HOST,
         port=8001,
-        reload=True,
+        uds=BACKEND_UDS,
+        loop=EVENT_LOOP,
+        http="httptools",
+        ws="websockets",
+        ws_max_size=WS_MAX_MESSAGE_SIZE,
+        ws_max_queue=WS_RECEIVE_QUEUE_SIZE,
+        workers=BACKEND_WORKERS,
+        reload=False,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        # No uvicorn handlers: its loggers propagate to the root queue handler
+        log_config=None,
         log_level="info"
     )
\ No newline at end of file